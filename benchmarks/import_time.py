@@ -0,0 +1,40 @@
+"""
+Measures the cost of `import talkbank_parser` in a fresh interpreter.
+
+Each run starts a new Python process, so the numbers include everything a
+short-lived CLI invocation pays before doing any work. The time of a bare
+interpreter start is measured the same way and subtracted.
+
+usage: python benchmarks/import_time.py [runs] [statement]
+"""
+
+from __future__ import print_function
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run(statement, runs):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', statement], env=env)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main(argv):
+    runs = int(argv[1]) if len(argv) > 1 else 20
+    statement = argv[2] if len(argv) > 2 else 'import talkbank_parser'
+    baseline = run('pass', runs)
+    total = run(statement, runs)
+    print("interpreter startup: {:.1f} ms".format(baseline * 1000))
+    print("{}: {:.1f} ms (+{:.1f} ms)".format(statement, total * 1000,
+                                             (total - baseline) * 1000))
+
+if __name__ == "__main__":
+    main(sys.argv)
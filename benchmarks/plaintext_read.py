@@ -0,0 +1,65 @@
+"""
+Compares reloading a corpus from the plaintext written by xml_to_plaintext
+with reparsing its XML, on a large file built by repeating one corpus file.
+
+The plaintext is read both in one pass and as byte ranges, as a worker process
+reading one range of an archive would.
+
+usage: python benchmarks/plaintext_read.py [xml file] [copies]
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from talkbank_parser import (MorParser, read_plaintext, read_plaintext_range,
+                             xml_to_plaintext)
+from talkbank_parser.plaintext import plaintext_byte_ranges
+
+def timed(utterances):
+    start = time.perf_counter()
+    count = sum(1 for _ in utterances)
+    return count, time.perf_counter() - start
+
+def read_ranges(filename):
+    for start, end in plaintext_byte_ranges(filename, 1 << 20):
+        for utterance in read_plaintext_range(filename, start, end):
+            yield utterance
+
+def main(argv):
+    xml_file = argv[1] if len(argv) > 1 else os.path.join(
+        ROOT, 'talkbank_parser', 'tests', 'fixtures', 'test_doc.xml')
+    copies = int(argv[2]) if len(argv) > 2 else 100
+
+    handle, single = tempfile.mkstemp(suffix='.txt')
+    os.close(handle)
+    handle, corpus = tempfile.mkstemp(suffix='.txt')
+    os.close(handle)
+    try:
+        xml_to_plaintext(xml_file, single)
+        with open(single) as infile:
+            text = infile.read()
+        with open(corpus, 'w') as outfile:
+            for _ in range(copies):
+                outfile.write(text)
+
+        count, xml_time = timed(MorParser().parse(xml_file))
+        print("{:>16}: {:.2f} s ({} utterances, extrapolated from one copy)"
+              .format('XML', xml_time * copies, count * copies))
+        for name, utterances in [('plaintext', read_plaintext(corpus)),
+                                 ('plaintext ranges', read_ranges(corpus))]:
+            count, seconds = timed(utterances)
+            print("{:>16}: {:.2f} s ({} utterances)".format(name, seconds,
+                                                           count))
+    finally:
+        os.remove(single)
+        os.remove(corpus)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -1,2 +1,18 @@
 from .talkbank_parser import *
-from talkbank_parser.pyparsing_mor_to_dict import parse_tag as tag_to_dict
+from . import talkbank_parser as _core
+from talkbank_parser.plaintext import read_plaintext, read_plaintext_range
+from talkbank_parser.gra import DependencyCorpus, GraTier
+
+def __getattr__(name):
+    # importing pyparsing and building the MOR grammar dominates import time,
+    # so tag_to_dict and the names talkbank_parser.py used to import eagerly
+    # are only resolved on first use.
+    if name == 'tag_to_dict':
+        value = _core.parse_tag
+    elif name in _core._LAZY_IMPORTS:
+        value = getattr(_core, name)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(
+            __name__, name))
+    globals()[name] = value
+    return value
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compact storage of the %gra (grammatical relation) tier.
+
+Each `<gra index="i" head="h" relation="R"/>` element names the head of the
+i-th mor item of its utterance. A GraTier stores these as two integer arrays
+aligned with the utterance's MorToken list: the position of each token's head
+and an interned code for its relation. A DependencyCorpus concatenates many
+tiers and indexes arcs by relation, so that a query only visits the arcs of
+the relation it asks for, e.g. subjects of verbs:
+
+    corpus = DependencyCorpus.from_parser(MorParser(), filenames)
+    corpus.find_tokens('SUBJ', head_pos='v')
+"""
+
+import bisect
+import itertools
+from array import array
+
+ROOT = -1      # head of the utterance's root (head="0" in the XML)
+NO_HEAD = -2   # token has no gra element, or its head is outside the utterance
+NO_CODE = -1   # relation code of a token without a gra element
+
+class CodeTable(object):
+    """ Interns strings as small, consecutive integer codes. """
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def intern(self, name):
+        try:
+            return self.codes[name]
+        except KeyError:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+            return code
+
+    def get(self, name, default=NO_CODE):
+        return self.codes.get(name, default)
+
+    def name(self, code):
+        return None if code == NO_CODE else self.names[code]
+
+    def __len__(self):
+        return len(self.names)
+
+class GraTier(object):
+    """ The dependencies of one utterance.
+
+    `heads[i]` is the position in the token list of token i's head, or ROOT /
+    NO_HEAD. `relations[i]` is the code of token i's relation in `table`, or
+    NO_CODE.
+    """
+    __slots__ = ['heads', 'relations', 'table']
+
+    def __init__(self, heads, relations, table):
+        self.heads = heads
+        self.relations = relations
+        self.table = table
+
+    @classmethod
+    def from_elements(cls, gras, table):
+        """ Builds a tier from a list of gra elements (or None for tokens
+        without one), one per token. """
+        positions = {}
+        for position, gra in enumerate(gras):
+            if gra is not None:
+                positions[gra.get("index")] = position
+        heads = array('i')
+        relations = array('i')
+        for gra in gras:
+            if gra is None:
+                heads.append(NO_HEAD)
+                relations.append(NO_CODE)
+                continue
+            head = gra.get("head")
+            heads.append(ROOT if head == "0" else positions.get(head, NO_HEAD))
+            relations.append(table.intern(gra.get("relation")))
+        return cls(heads, relations, table)
+
+    def relation(self, position):
+        return self.table.name(self.relations[position])
+
+    def dependents(self, position, relation=None):
+        """ Positions of the tokens whose head is `position`, optionally only
+        those attached by `relation`. """
+        code = None if relation is None else self.table.get(relation)
+        return [i for i, head in enumerate(self.heads)
+                if head == position and
+                (code is None or self.relations[i] == code)]
+
+    def __len__(self):
+        return len(self.heads)
+
+    def __repr__(self):
+        return "GraTier({})".format(" ".join(
+            "{}|{}|{}".format(i + 1, h + 1 if h >= 0 else h, self.relation(i))
+            for i, h in enumerate(self.heads)))
+
+class DependencyCorpus(object):
+    """ The tokens and dependencies of many utterances in flat arrays.
+
+    Heads are stored as offsets into the whole corpus, and `by_relation[code]`
+    holds the offsets of every dependent attached by that relation to a token
+    of its utterance. Use `add` with the tuples yielded by
+    MorParser.parse_gra, then `find` to query.
+    """
+    def __init__(self, relations=None):
+        self.relations = relations if relations is not None else CodeTable()
+        self.pos = CodeTable()
+        self.utterances = []        # (uid, speaker, tokens)
+        self.starts = array('l')    # corpus offset of each utterance
+        self.heads = array('l')
+        self.rels = array('i')
+        self.pos_codes = array('i')
+        self.by_relation = []       # relation code -> array of offsets
+
+    def add(self, uid, speaker, tokens, tier):
+        if tier.table is not self.relations:
+            raise ValueError("tier uses a different relation table")
+        start = len(self.heads)
+        self.utterances.append((uid, speaker, tokens))
+        self.starts.append(start)
+        self.heads.extend(head + start if head >= 0 else head
+                          for head in tier.heads)
+        self.rels.extend(tier.relations)
+        by_relation = self.by_relation
+        for position, (head, code) in enumerate(zip(tier.heads,
+                                                    tier.relations)):
+            if head < 0 or code == NO_CODE:
+                continue
+            while len(by_relation) <= code:
+                by_relation.append(array('l'))
+            by_relation[code].append(start + position)
+        self.pos_codes.extend(
+            self.pos.intern(token.pos if token is not None else None)
+            for token in tokens)
+
+    @classmethod
+    def from_parser(cls, parser, filenames):
+        """ Parses every file in `filenames` with `parser` (a MorParser). """
+        corpus = cls(parser.relations)
+        for filename in filenames:
+            for uid, speaker, tokens, tier in parser.parse_gra(filename):
+                corpus.add(uid, speaker, tokens, tier)
+        return corpus
+
+    def find(self, relation=None, head_pos=None, dependent_pos=None):
+        """ Returns (dependent, head) corpus offsets of every dependency that
+        matches all of the given relation name, head POS and dependent POS.
+        Dependencies on ROOT and tokens without a head are never returned. """
+        heads, pos_codes = self.heads, self.pos_codes
+        if relation is None:
+            candidates = itertools.chain.from_iterable(self.by_relation)
+        else:
+            code = self.relations.get(relation)
+            if code == NO_CODE or code >= len(self.by_relation):
+                return []
+            candidates = self.by_relation[code]
+        if dependent_pos is not None:
+            dep_code = self.pos.get(dependent_pos)
+            candidates = [i for i in candidates if pos_codes[i] == dep_code]
+        if head_pos is not None:
+            head_code = self.pos.get(head_pos)
+            return sorted((i, heads[i]) for i in candidates
+                          if pos_codes[heads[i]] == head_code)
+        return sorted((i, heads[i]) for i in candidates)
+
+    def locate(self, offset):
+        """ Returns (utterance number, position in utterance) of a corpus
+        offset. """
+        utterance = bisect.bisect_right(self.starts, offset) - 1
+        return utterance, offset - self.starts[utterance]
+
+    def token(self, offset):
+        utterance, position = self.locate(offset)
+        return self.utterances[utterance][2][position]
+
+    def find_tokens(self, relation=None, head_pos=None, dependent_pos=None):
+        """ Like `find`, but returns (dependent, head) MorToken pairs. """
+        return [(self.token(dep), self.token(head)) for dep, head
+                in self.find(relation, head_pos, dependent_pos)]
+
+    def __len__(self):
+        return len(self.heads)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reader for the plaintext corpus format written by `xml_to_plaintext`.
+
+Each line holds one utterance:
+
+    uid speaker word/prefix#pos:subPos|stem&sxfx-sfx ...
+
+Lines are read in bulk, and within one read each distinct token and tag string
+(everything after the wordform) is only parsed once.
+
+Large files can be split into byte ranges with `plaintext_byte_ranges` and read
+with `read_plaintext_range`, e.g. one range per worker process. Each worker
+should consume its utterances itself: sending MorTokens back between
+processes costs more than parsing them.
+"""
+
+import itertools
+import locale
+import os
+import re
+from typing import Optional
+
+from talkbank_parser.talkbank_parser import MorToken
+
+_STEM_RE = re.compile(r"^(.+?)((?:&[^&\-]+)*)((?:-[^&\-]+)*)$")
+
+def _none_if_missing(value):
+    # MorToken.__repr__ writes a missing pos or stem as "None"
+    return None if value == "None" else value
+
+def _parse_tag(tag, tag_cache):
+    """ Splits a tag string (the part after "word/") into the MorToken fields
+    (prefix, pos, subPos, stem, sxfx, sfx), memoized in `tag_cache`. """
+    try:
+        return tag_cache[tag]
+    except KeyError:
+        pass
+    head, _, tail = tag.partition("|")
+    prefix = head.split("#")
+    pos_parts = prefix.pop().split(":")
+    match = _STEM_RE.match(tail)
+    if match is None:
+        stem, sxfx, sfx = tail, [], []
+    else:
+        stem, sxfx, sfx = match.groups()
+        sxfx = sxfx.split("&")[1:]
+        sfx = sfx.split("-")[1:]
+    fields = (tuple(prefix), _none_if_missing(pos_parts[0]),
+              tuple(pos_parts[1:]), _none_if_missing(stem), tuple(sxfx),
+              tuple(sfx))
+    tag_cache[tag] = fields
+    return fields
+
+def _parse_token(token, token_cache, tag_cache):
+    """ Returns (word, fields) for a `word/tag` token, or None for the literal
+    "None" that parse_clitic() failures are written as. Memoized in
+    `token_cache`. """
+    try:
+        return token_cache[token]
+    except KeyError:
+        pass
+    if token == "None":
+        parsed = None
+    else:
+        bar = token.find("|")
+        slash = token.rfind("/", 0, bar if bar >= 0 else len(token))
+        if slash < 0:
+            raise ValueError("Malformed plaintext token {!r}".format(token))
+        parsed = token[:slash], _parse_tag(token[slash + 1:], tag_cache)
+    token_cache[token] = parsed
+    return parsed
+
+def _make_token(parsed):
+    if parsed is None:
+        return None
+    word, (prefix, pos, subPos, stem, sxfx, sfx) = parsed
+    return MorToken(list(prefix), word, stem, pos, list(subPos), list(sxfx),
+                    list(sfx))
+
+def parse_plaintext_token(token: str) -> Optional[MorToken]:
+    """ Parses a single `word/tag` token as written by `MorToken.__repr__`.
+
+    >>> parse_plaintext_token("'s/aux|be&3S")
+    's/aux|be&3S
+    """
+    return _make_token(_parse_token(token, {}, {}))
+
+def parse_plaintext_lines(lines):
+    """ Yields (uid, speaker, tokens) tuples for an iterable of plaintext
+    lines, in the same shape as `MorParser.parse`. Blank lines are skipped.
+
+    Parsed tokens are memoized for the duration of the call only, so memory
+    use is bounded by the distinct tokens of `lines`. """
+    token_cache, tag_cache = {}, {}
+    for line in lines:
+        fields = line.split()
+        if not fields:
+            continue
+        if len(fields) < 2:
+            raise ValueError("Malformed plaintext line {!r}".format(line))
+        yield (fields[0], fields[1],
+               [_make_token(_parse_token(tok, token_cache, tag_cache))
+                for tok in fields[2:]])
+
+def read_plaintext(filename: str, start: int = 0, stop: Optional[int] = None):
+    """ Reads the plaintext file at `filename`, yielding (uid, speaker, tokens)
+    tuples. `start` and `stop` restrict reading to that range of line numbers,
+    following slice semantics. """
+    with open(filename) as infile:
+        for utterance in parse_plaintext_lines(
+                itertools.islice(infile, start, stop)):
+            yield utterance
+
+def plaintext_byte_ranges(filename: str, chunk_size: int = 1 << 22):
+    """ Splits the file at `filename` into (start, end) byte ranges of
+    `chunk_size` bytes, to be passed to `read_plaintext_range`. """
+    size = os.path.getsize(filename)
+    return [(start, min(start + chunk_size, size))
+            for start in range(0, size, chunk_size)]
+
+def _lines_in_range(infile, start, end):
+    """ Yields the lines of binary file `infile` that start within
+    [start, end). """
+    if start:
+        # skip the tail of a line that began in the previous range
+        infile.seek(start - 1)
+        infile.readline()
+    position = infile.tell()
+    # binary files split on b"\n" only, as text-mode iteration does
+    for line in infile:
+        if end is not None and position >= end:
+            return
+        position += len(line)
+        yield line
+
+def read_plaintext_range(filename: str, start: int, end: Optional[int] = None):
+    """ Like `read_plaintext`, but reads only the lines whose first byte lies
+    within [start, end) of the file. Ranges that tile the file, such as those
+    from `plaintext_byte_ranges`, yield every utterance exactly once, no matter
+    where the range boundaries fall. """
+    encoding = locale.getpreferredencoding(False)
+    with open(filename, 'rb') as infile:
+        for utterance in parse_plaintext_lines(
+                line.decode(encoding)
+                for line in _lines_in_range(infile, start, end)):
+            yield utterance
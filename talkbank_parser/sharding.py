@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+
+"""
+Coordinator/worker ingestion of many corpus files over a shared filesystem.
+
+The coordinator writes a manifest splitting the input files into shards.
+Any number of workers, on any number of nodes that can see the work
+directory, then claim shards and parse them with `MorParser`:
+
+- a shard is claimed by creating `shards/<id>.lock` with O_CREAT | O_EXCL,
+  which succeeds for exactly one worker;
+- the claiming worker touches its lock after every file as a heartbeat and
+  records its progress in `shards/<id>.progress`;
+- output is written to a temporary file and renamed to `shards/<id>.jsonl`
+  (or `.pkl`), so a shard is done once its output exists;
+- a lock whose heartbeat is older than the lease timeout belongs to a
+  crashed worker and may be reclaimed by another one;
+- each lock holds a unique token, and a worker only refreshes or removes a
+  lock that still holds its own token.
+
+A shard whose parse raises is marked failed in `shards/<id>.failed`, which
+holds the traceback, and is skipped until a worker is started with
+`--retry-failed` (or `run_worker(retry_failed=True)`), which clears the marks
+first. `status` reports each shard's state and the progress its worker last
+recorded. `merge` concatenates the shard outputs in manifest order once every
+shard is done. No services beyond the filesystem are needed, e.g.
+
+    python -m talkbank_parser.sharding coordinator work/ corpora/*.xml
+    python -m talkbank_parser.sharding worker work/     # on every node
+    python -m talkbank_parser.sharding status work/
+    python -m talkbank_parser.sharding worker work/ --retry-failed
+    python -m talkbank_parser.sharding merge work/ corpus.jsonl
+"""
+
+from __future__ import print_function
+
+import argparse
+import errno
+import json
+import os
+import pickle
+import shutil
+import socket
+import sys
+import time
+import traceback
+import uuid
+from typing import List
+
+from talkbank_parser.talkbank_parser import MorParser
+
+FORMATS = {'jsonl': '.jsonl', 'binary': '.pkl'}
+
+class ShardError(Exception):
+    """ Raised when the work directory is missing shards or is malformed """
+    pass
+
+class LeaseLost(ShardError):
+    """ Raised when a worker finds its shard lock reclaimed by another worker """
+    pass
+
+def _shard_path(work_dir, shard_id, suffix):
+    return os.path.join(work_dir, 'shards', shard_id + suffix)
+
+def _write_atomic(path, data, mode='w'):
+    tmp = '{}.tmp.{}.{}'.format(path, socket.gethostname(), os.getpid())
+    with open(tmp, mode) as outfile:
+        outfile.write(data)
+    os.replace(tmp, path)
+
+def write_manifest(work_dir: str, filenames: List[str], shard_size: int = 1,
+                   output_format: str = 'jsonl'):
+    """ Splits `filenames` into shards of `shard_size` files and writes the
+    manifest to `work_dir`. Returns the manifest. """
+    if output_format not in FORMATS:
+        raise ValueError("Unknown output format {!r}".format(output_format))
+    filenames = [os.path.abspath(f) for f in filenames]
+    shards = [{'id': 'shard-{:05d}'.format(n),
+               'files': filenames[start:start + shard_size]}
+              for n, start in enumerate(range(0, len(filenames), shard_size))]
+    manifest = {'format': output_format, 'shards': shards}
+    os.makedirs(os.path.join(work_dir, 'shards'), exist_ok=True)
+    _write_atomic(os.path.join(work_dir, 'manifest.json'),
+                  json.dumps(manifest, indent=1))
+    return manifest
+
+def read_manifest(work_dir: str):
+    with open(os.path.join(work_dir, 'manifest.json')) as infile:
+        return json.load(infile)
+
+def _output_path(work_dir, manifest, shard):
+    return _shard_path(work_dir, shard['id'], FORMATS[manifest['format']])
+
+def _lock_token(path):
+    """ Returns the token written into the lock file at `path`, or None if it
+    is missing or not yet written. """
+    try:
+        with open(path) as lock:
+            return json.load(lock).get('token')
+    except (OSError, ValueError):
+        return None
+
+def _set_aside(lock_path, reason):
+    """ Atomically moves the lock at `lock_path` to a unique name, so that it
+    can be inspected without anyone else acting on it. Returns the new name,
+    or None if there was no lock to move. """
+    aside = '{}.{}.{}'.format(lock_path, reason, uuid.uuid4().hex)
+    try:
+        os.rename(lock_path, aside)
+    except OSError:
+        return None
+    return aside
+
+def _restore(aside, lock_path):
+    """ Puts a lock moved by _set_aside back, unless a new lock has been
+    created in the meantime. """
+    try:
+        # unlike rename, link fails rather than replacing an existing lock
+        os.link(aside, lock_path)
+    except OSError:
+        pass
+    os.remove(aside)
+
+def _break_stale(lock_path, seen_token, lease_timeout):
+    """ Removes the lock at `lock_path` if it is still the stale lock holding
+    `seen_token`. Returns True if it was removed.
+
+    Between our staleness check and the rename another worker may have broken
+    the lock and taken a fresh one, so the file is only discarded if its token
+    and heartbeat show it is the one judged stale. """
+    aside = _set_aside(lock_path, 'stale')
+    if aside is None:
+        return False
+    if (_lock_token(aside) != seen_token or
+            time.time() - os.stat(aside).st_mtime < lease_timeout):
+        _restore(aside, lock_path)
+        return False
+    os.remove(aside)
+    return True
+
+def _claim(lock_path, worker_id, lease_timeout):
+    """ Tries to take the lock at `lock_path`, reclaiming it if its heartbeat
+    is older than `lease_timeout` seconds. Returns the unique token written
+    into the lock on success, or None. """
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+        try:
+            age = time.time() - os.stat(lock_path).st_mtime
+        except OSError:
+            # released between our open and stat; try again next pass
+            return None
+        if age < lease_timeout:
+            return None
+        if not _break_stale(lock_path, _lock_token(lock_path), lease_timeout):
+            return None
+        return _claim(lock_path, worker_id, lease_timeout)
+    token = uuid.uuid4().hex
+    with os.fdopen(fd, 'w') as lock:
+        lock.write(json.dumps({'worker': worker_id, 'token': token,
+                               'claimed': time.time()}))
+    return token
+
+def _heartbeat(lock_path, token):
+    """ Refreshes our lease on a shard. Raises LeaseLost if the lock has been
+    reclaimed by another worker. """
+    if _lock_token(lock_path) != token:
+        raise LeaseLost(lock_path)
+    os.utime(lock_path)
+
+def _release(lock_path, token):
+    """ Removes the lock at `lock_path` if it still holds `token`. """
+    aside = _set_aside(lock_path, 'release')
+    if aside is None:
+        return
+    if _lock_token(aside) == token:
+        os.remove(aside)
+    else:
+        _restore(aside, lock_path)
+
+def _write_output(path, output_format, utterances):
+    if output_format == 'jsonl':
+        data = ''.join(json.dumps(u) + '\n' for u in utterances)
+        _write_atomic(path, data)
+    else:
+        _write_atomic(path, pickle.dumps(utterances, pickle.HIGHEST_PROTOCOL),
+                      mode='wb')
+
+def process_shard(work_dir, manifest, shard, worker_id, token, parser=None):
+    """ Parses every file in `shard` and writes the shard output. The caller
+    must hold the shard lock, claimed with `token`. """
+    parser = parser or MorParser(cache_size=2 ** 16)
+    lock_path = _shard_path(work_dir, shard['id'], '.lock')
+    progress_path = _shard_path(work_dir, shard['id'], '.progress')
+    utterances = []
+    for done, filename in enumerate(shard['files']):
+        for uid, speaker, tokens in parser.parse(filename):
+            if manifest['format'] == 'jsonl':
+                utterances.append({
+                    'file': filename, 'uid': uid, 'speaker': speaker,
+                    'tokens': [t.to_dict() if t else None for t in tokens]})
+            else:
+                utterances.append((filename, uid, speaker, tokens))
+        _heartbeat(lock_path, token)
+        _write_atomic(progress_path, json.dumps({
+            'worker': worker_id, 'files_done': done + 1,
+            'files_total': len(shard['files']),
+            'utterances': len(utterances), 'updated': time.time()}))
+    _write_output(_output_path(work_dir, manifest, shard), manifest['format'],
+                  utterances)
+
+def clear_failed(work_dir: str):
+    """ Removes the failure marks (and stale progress) of failed shards so that
+    workers will process them again. Returns the ids of the cleared shards. """
+    cleared = []
+    for shard in read_manifest(work_dir)['shards']:
+        try:
+            os.remove(_shard_path(work_dir, shard['id'], '.failed'))
+        except OSError:
+            continue
+        try:
+            os.remove(_shard_path(work_dir, shard['id'], '.progress'))
+        except OSError:
+            pass
+        cleared.append(shard['id'])
+    return cleared
+
+def run_worker(work_dir: str, worker_id: str = None,
+               lease_timeout: float = 3600, poll_interval: float = 5,
+               wait: bool = True, retry_failed: bool = False):
+    """ Claims and processes shards until every shard in the manifest is done
+    or failed. Returns the number of shards this worker processed.
+
+    If `wait` is true, the worker keeps polling while other workers hold
+    shards, so that it can reclaim them should those workers crash. If
+    `retry_failed` is true, shards that failed earlier are cleared first and
+    processed again.
+    """
+    worker_id = worker_id or '{}-{}'.format(socket.gethostname(), os.getpid())
+    manifest = read_manifest(work_dir)
+    if retry_failed:
+        clear_failed(work_dir)
+    parser = MorParser(cache_size=2 ** 16)
+    processed = 0
+    while True:
+        pending = False
+        for shard in manifest['shards']:
+            if (os.path.exists(_output_path(work_dir, manifest, shard)) or
+                    os.path.exists(_shard_path(work_dir, shard['id'],
+                                               '.failed'))):
+                continue
+            lock_path = _shard_path(work_dir, shard['id'], '.lock')
+            token = _claim(lock_path, worker_id, lease_timeout)
+            if token is None:
+                # held by another worker, which may yet crash
+                pending = True
+                continue
+            try:
+                # another worker may have finished it while we were claiming
+                if not os.path.exists(_output_path(work_dir, manifest, shard)):
+                    process_shard(work_dir, manifest, shard, worker_id, token,
+                                  parser)
+                    processed += 1
+            except LeaseLost:
+                print("worker {}: lost lease on {}".format(worker_id,
+                                                           shard['id']),
+                      file=sys.stderr)
+            except Exception:
+                _write_atomic(_shard_path(work_dir, shard['id'], '.failed'),
+                              traceback.format_exc())
+                print("worker {}: {} failed".format(worker_id, shard['id']),
+                      file=sys.stderr)
+            finally:
+                _release(lock_path, token)
+        if not pending or not wait:
+            return processed
+        time.sleep(poll_interval)
+
+def status(work_dir: str, lease_timeout: float = 3600):
+    """ Returns a dict mapping each shard id to one of 'done', 'failed',
+    'running', 'stale' or 'pending'. """
+    manifest = read_manifest(work_dir)
+    result = {}
+    for shard in manifest['shards']:
+        lock_path = _shard_path(work_dir, shard['id'], '.lock')
+        if os.path.exists(_output_path(work_dir, manifest, shard)):
+            state = 'done'
+        elif os.path.exists(_shard_path(work_dir, shard['id'], '.failed')):
+            state = 'failed'
+        else:
+            try:
+                age = time.time() - os.stat(lock_path).st_mtime
+                state = 'running' if age < lease_timeout else 'stale'
+            except OSError:
+                state = 'pending'
+        result[shard['id']] = state
+    return result
+
+def progress(work_dir: str):
+    """ Returns a dict mapping each shard id to the progress its worker last
+    recorded (a dict with `worker`, `files_done`, `files_total`, `utterances`
+    and `updated`), or None if no worker has finished a file of it yet. """
+    result = {}
+    for shard in read_manifest(work_dir)['shards']:
+        try:
+            with open(_shard_path(work_dir, shard['id'], '.progress')) as infile:
+                result[shard['id']] = json.load(infile)
+        except (OSError, ValueError):
+            result[shard['id']] = None
+    return result
+
+def merge(work_dir: str, output_fn: str):
+    """ Concatenates all shard outputs, in manifest order, into `output_fn`.
+    Raises ShardError if any shard is not done. """
+    manifest = read_manifest(work_dir)
+    missing = [shard['id'] for shard in manifest['shards']
+               if not os.path.exists(_output_path(work_dir, manifest, shard))]
+    if missing:
+        raise ShardError("Shards not done: {}".format(', '.join(missing)))
+    if manifest['format'] == 'jsonl':
+        with open(output_fn, 'w') as outfile:
+            for shard in manifest['shards']:
+                with open(_output_path(work_dir, manifest, shard)) as infile:
+                    shutil.copyfileobj(infile, outfile)
+    else:
+        # each shard is one pickled list; keeping them as they are preserves
+        # the tokens shared within a shard, which re-pickling per utterance
+        # would write out again every time.
+        with open(output_fn, 'wb') as outfile:
+            for shard in manifest['shards']:
+                with open(_output_path(work_dir, manifest, shard), 'rb') as infile:
+                    shutil.copyfileobj(infile, outfile)
+
+def read_merged(filename: str):
+    """ Yields (filename, uid, speaker, tokens) tuples from a merged binary
+    output. """
+    with open(filename, 'rb') as infile:
+        while True:
+            try:
+                utterances = pickle.load(infile)
+            except EOFError:
+                return
+            for utterance in utterances:
+                yield utterance
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    coordinator = commands.add_parser('coordinator',
+                                      help='write the shard manifest')
+    coordinator.add_argument('work_dir')
+    coordinator.add_argument('files', nargs='+')
+    coordinator.add_argument('--shard-size', type=int, default=1)
+    coordinator.add_argument('--format', choices=sorted(FORMATS),
+                             default='jsonl')
+
+    worker = commands.add_parser('worker', help='process shards')
+    worker.add_argument('work_dir')
+    worker.add_argument('--worker-id')
+    worker.add_argument('--lease-timeout', type=float, default=3600)
+    worker.add_argument('--no-wait', action='store_true')
+    worker.add_argument('--retry-failed', action='store_true',
+                        help='clear failed shards and process them again')
+
+    stat = commands.add_parser('status', help='report shard states')
+    stat.add_argument('work_dir')
+    stat.add_argument('--lease-timeout', type=float, default=3600)
+
+    merger = commands.add_parser('merge', help='combine shard outputs')
+    merger.add_argument('work_dir')
+    merger.add_argument('output')
+
+    args = parser.parse_args(argv)
+    if args.command == 'coordinator':
+        manifest = write_manifest(args.work_dir, args.files, args.shard_size,
+                                  args.format)
+        print("wrote {} shards".format(len(manifest['shards'])))
+    elif args.command == 'worker':
+        processed = run_worker(args.work_dir, args.worker_id,
+                               args.lease_timeout, wait=not args.no_wait,
+                               retry_failed=args.retry_failed)
+        print("processed {} shards".format(processed))
+    elif args.command == 'status':
+        reports = progress(args.work_dir)
+        for shard_id, state in sorted(status(args.work_dir,
+                                             args.lease_timeout).items()):
+            report = reports[shard_id]
+            if report is None:
+                print(shard_id, state)
+            else:
+                print(shard_id, state,
+                      "{files_done}/{files_total} files, {utterances} "
+                      "utterances ({worker})".format(**report))
+    elif args.command == 'merge':
+        merge(args.work_dir, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -12,14 +12,33 @@ schema is here http://talkbank.org/software/talkbank.xsd
 from __future__ import print_function
 
 import abc
+import collections
+import importlib
 import itertools
 import re
 import sys
 from string import Template
 from typing import List
-from xml.etree.cElementTree import ElementTree
 
-from talkbank_parser.pyparsing_mor_to_dict import parse_tag
+from talkbank_parser.gra import CodeTable, GraTier
+
+# Names this module used to import eagerly, still served as module attributes
+# for backwards compatibility. They are slow to load, so they are only imported
+# on first access.
+_LAZY_IMPORTS = {
+    'parse_tag': ('talkbank_parser.pyparsing_mor_to_dict', 'parse_tag'),
+    'ElementTree': ('xml.etree.cElementTree', 'ElementTree'),
+}
+
+def __getattr__(name):
+    try:
+        module, attr = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError("module {!r} has no attribute {!r}".format(
+            __name__, name))
+    value = getattr(importlib.import_module(module), attr)
+    globals()[name] = value
+    return value
 
 class MorToken(object):
     """Represents a POS-tagged word in a Talkbank corpus file. Rather than a simple
@@ -77,7 +96,13 @@ class MorToken(object):
                 # general case we should care. perhaps a WILDCARD singleton
                 # class used as a value could signal for this case...
                 continue
-            if self.__dict__[key] != other.__dict__[key]:
+            mine, theirs = self.__dict__[key], other.__dict__[key]
+            # FrozenMorTokens hold tuples where MorTokens hold lists.
+            if isinstance(mine, tuple):
+                mine = list(mine)
+            if isinstance(theirs, tuple):
+                theirs = list(theirs)
+            if mine != theirs:
                 return False
         return True
 
@@ -111,6 +136,8 @@ class MorToken(object):
         >>> MorToken.from_string('cooj:coo|and')
         and/cooj:coo|and
         """
+        # building the pyparsing grammar is slow, so defer it to first use.
+        from talkbank_parser.pyparsing_mor_to_dict import parse_tag
         try:
             tdict = parse_tag(string)
         except:
@@ -125,6 +152,38 @@ class MorToken(object):
             sxfx=tdict.get('fusional_suffix', []),
             sfx=tdict.get('suffix', []))
 
+class FrozenMorToken(MorToken):
+    """ An immutable MorToken. List fields are stored as tuples.
+
+    Returned by MorParser when its mor-element cache is enabled, since the same
+    instance is then shared between every occurrence of a word.
+    """
+    def __init__(self, prefix, word, stem, pos, subPos, sxfx, sfx):
+        for key, value in [('prefix', tuple(prefix)), ('word', word),
+                           ('stem', stem), ('pos', pos),
+                           ('subPos', tuple(subPos)), ('sxfx', tuple(sxfx)),
+                           ('sfx', tuple(sfx))]:
+            object.__setattr__(self, key, value)
+
+    @classmethod
+    def freeze(cls, token):
+        """ Returns an immutable copy of `token`. """
+        if token is None or isinstance(token, FrozenMorToken):
+            return token
+        return cls(token.prefix, token.word, token.stem, token.pos,
+                   token.subPos, token.sxfx, token.sfx)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("FrozenMorToken is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("FrozenMorToken is immutable")
+
+    def __hash__(self):
+        # word is left out, as MorToken.__eq__ ignores it
+        return hash((self.prefix, self.stem, self.pos, self.subPos,
+                     self.sxfx, self.sfx))
+
 punctuation = {"p": ".",
                "q": "?"}
 
@@ -165,6 +224,47 @@ class TagTypeError(Exception):
 
     pass
 
+CacheInfo = collections.namedtuple("CacheInfo",
+                                   ["hits", "misses", "maxsize", "currsize"])
+
+class MorCache(object):
+    """ A bounded LRU mapping from mor-subtree signatures to parsed tokens.
+
+    Keeps hit/miss counts, reported by `info()` in the style of
+    functools.lru_cache.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
 class TalkbankParser(object):
     """ Parses entire CHA document.
 
@@ -221,10 +321,37 @@ class Parser:
         return self._qualify_path(path, self.namespace)
 
 class MorParser(Parser):
+    """ Parses the words and mor tiers of a TalkBank XML document.
+
+    If `cache_size` is non-zero, the tokens produced for each distinct
+    (wordform, mor subtree) pair are memoized in an LRU cache holding up to
+    `cache_size` entries. Cached tokens are FrozenMorTokens and are shared
+    between all occurrences of the word.
+    """
 
-    def __init__(self):
+    def __init__(self, cache_size=0):
         super(MorParser, self).__init__(
             namespace="{http://www.talkbank.org/ns/talkbank}")
+        self.cache = MorCache(cache_size) if cache_size else None
+        self.relations = CodeTable()
+
+    def cache_info(self):
+        """ Returns hit/miss statistics for the mor-element cache, or None if
+        caching is disabled. """
+        if self.cache is None:
+            return None
+        return self.cache.info()
+
+    def mor_signature(self, element):
+        """ Returns a hashable signature of the mor subtree rooted at element.
+
+        The signature captures everything parse_mor_element reads (tags, text
+        and `type` attributes, in document order) and skips gra elements, whose
+        indices differ between otherwise identical words.
+        """
+        gra = self.ns("gra")
+        return tuple((e.tag, e.text, e.get("type"))
+                     for e in element.iter() if e.tag != gra)
 
     def parse_pos(self, element):
         """ Returns the pos and list of subPos found in element.
@@ -353,6 +480,18 @@ class MorParser(Parser):
                   file=sys.stderr)
             return []
         assert(element.tag == self.ns("mor"))
+        if self.cache is None:
+            return self._parse_mor_element(text, element)
+
+        key = (text, self.mor_signature(element))
+        parts = self.cache.get(key)
+        if parts is None:
+            parts = tuple(FrozenMorToken.freeze(part) for part in
+                          self._parse_mor_element(text, element))
+            self.cache.put(key, parts)
+        return list(parts)
+
+    def _parse_mor_element(self, text, element):
         compound = self._find(element, "mwc")
         base_word, post_clitic_words = self.split_clitic_wordform(text)
 
@@ -400,41 +539,84 @@ class MorParser(Parser):
         text = self.remove_bad_symbols(text)
         return text
 
+    def _parse_words(self, utterance):
+        """ Yields a (tokens, mor) pair for each word-level element of
+        utterance, where mor is the mor element the tokens were read from (or
+        None). """
+        for word in utterance:
+            if word.attrib.get('type') == 'comma':
+                yield [MorToken.punct(',')], self._find(word, "mor")
+            elif word.tag == self.ns('tagMarker'):
+                yield [MorToken.punct(',')], self._find(word, "mor")
+            elif (word is None or len(word) == 0 or
+                word.attrib.get('type') == 'fragment'):
+                continue
+            elif word.tag == self.ns("w"):
+                replacement = self._find(word, "replacement")
+                if replacement:
+                    for rep_word in self._findall(replacement, "w"):
+                        rep_mor = self._find(rep_word, "mor")
+                        yield (self.parse_mor_element(rep_word, rep_mor),
+                               rep_mor)
+                else:
+                    mor = self._find(word, "mor")
+                    yield self.parse_mor_element(word, mor), mor
+            elif word.tag == self.ns("t"):
+                punct = punctuation.get(word.get("type"), "-")
+                yield [MorToken.punct(punct)], self._find(word, "mor")
+            elif word.tag == self.ns("g"):
+                for sub_word in word:
+                    if sub_word.tag != self.ns("w") or len(sub_word) == 0:
+                        continue
+                    sub_mor = self._find(sub_word, 'mor')
+                    if sub_mor:
+                        yield self.parse_mor_element(sub_word, sub_mor), sub_mor
+
+    def _read_document(self, filename):
+        # deferred so that importing the package does not load the XML parser
+        from xml.etree.cElementTree import ElementTree
+        return ElementTree(file=filename)
+
     def parse(self, filename):
-        doc = ElementTree(file=filename)
+        doc = self._read_document(filename)
         for utterance in self._findall(doc, "u"):
             speaker = utterance.get("who")
             uid = utterance.get("uID")
-
-            words = []
-            for word in utterance:
-                if word.attrib.get('type') == 'comma':
-                    words.append([MorToken.punct(',')])
-                elif word.tag == self.ns('tagMarker'):
-                    words.append([MorToken.punct(',')])
-                elif (word is None or len(word) == 0 or
-                    word.attrib.get('type') == 'fragment'):
-                    continue
-                elif word.tag == self.ns("w"):
-                    replacement = self._find(word, "replacement")
-                    if replacement:
-                        for rep_word in self._findall(replacement, "w"):
-                            words.append(self.parse_mor_element(rep_word,
-                                                                self._find(rep_word, "mor")))
-                    else:
-                        words.append(self.parse_mor_element(word, self._find(word, "mor")))
-                elif word.tag == self.ns("t"):
-                    punct = punctuation.get(word.get("type"), "-")
-                    words.append([MorToken.punct(punct)])
-                elif word.tag == self.ns("g"):
-                    for sub_word in word:
-                        if sub_word.tag != self.ns("w") or len(sub_word) == 0:
-                            continue
-                        sub_mor = self._find(sub_word, 'mor')
-                        if sub_mor:
-                            words.append(self.parse_mor_element(sub_word, sub_mor))
+            words = [tokens for tokens, mor in self._parse_words(utterance)]
             yield uid, speaker, list(flatten(words))
 
+    def parse_gra_element(self, element, count):
+        """ Returns the gra elements of the mor element `element`, aligned with
+        the `count` tokens parse_mor_element produced for it (pre-clitics, the
+        word itself, then post-clitics). Returns `count` Nones if they cannot
+        be aligned.
+        """
+        if element is None:
+            return [None] * count
+        gras = [g for g in self._findall(element, "mor-pre/gra") +
+                self._findall(element, "gra") +
+                self._findall(element, "mor-post/gra")
+                if g.get("type") == "gra"]
+        if len(gras) != count:
+            return [None] * count
+        return gras
+
+    def parse_gra(self, filename):
+        """ Like parse, but yields (uid, speaker, tokens, gra) tuples, where gra
+        is a GraTier holding the %gra dependencies aligned with tokens.
+        Relation codes are interned in self.relations, shared by every file
+        this parser reads. """
+        doc = self._read_document(filename)
+        for utterance in self._findall(doc, "u"):
+            speaker = utterance.get("who")
+            uid = utterance.get("uID")
+            tokens, gras = [], []
+            for word_tokens, mor in self._parse_words(utterance):
+                tokens.extend(word_tokens)
+                gras.extend(self.parse_gra_element(mor, len(word_tokens)))
+            yield uid, speaker, tokens, GraTier.from_elements(gras,
+                                                               self.relations)
+
           #   elif j.tag == ns("s"):
           #     print punct(j.get("type")),
           #   elif j.tag == ns("t"):
@@ -444,7 +626,7 @@ class MorParser(Parser):
 def xml_to_plaintext(xml_input: str, output_fn: str):
     """Converts an xml CHILDES corpus file at `xml_input` to a text-version at
     `output_fn`"""
-    parser = MorParser()
+    parser = MorParser(cache_size=2 ** 16)
     with open(output_fn, 'w') as outfile:
         for uid, speaker, utterance in parser.parse(xml_input):
             outputline = uid + ' ' + speaker + ' ' + prettyUtterance(utterance) + '\n'
@@ -0,0 +1,67 @@
+import unittest
+
+from talkbank_parser import MorParser
+from talkbank_parser.gra import NO_HEAD, ROOT, DependencyCorpus
+
+
+class GraTest(unittest.TestCase):
+    def test_clitics(self):
+        parser = MorParser()
+        uid, speaker, tokens, tier = list(
+            parser.parse_gra("fixtures/clitics.xml"))[-1]
+        self.assertEqual(len(tokens), len(tier))
+        self.assertEqual(list(tier.heads), [5, 0, 5, 5, 5, ROOT, 5])
+        self.assertEqual([tier.relation(i) for i in range(len(tier))],
+                         ['JCT', 'JCT', 'JCT', 'JCT', 'SUBJ', 'ROOT', 'PUNCT'])
+        # the post-clitic 'd carries its own relation
+        self.assertEqual(tokens[4].word, "'d")
+        self.assertEqual(tier.dependents(5, 'SUBJ'), [4])
+
+    def test_commas_and_missing_heads(self):
+        parser = MorParser()
+        tiers = {uid: (tokens, tier) for uid, speaker, tokens, tier
+                 in parser.parse_gra("fixtures/commas.xml")}
+        tokens, tier = tiers['u420']
+        self.assertEqual(tokens[1].pos, ',')
+        self.assertEqual(tier.relation(1), 'LP')
+        self.assertEqual(list(tier.heads), [ROOT, 0, 0, 0])
+        # u152 is an excerpt, so some heads point outside the utterance
+        tokens, tier = tiers['u152']
+        self.assertEqual(tier.heads[0], NO_HEAD)
+
+    def test_without_gra(self):
+        parser = MorParser()
+        for uid, speaker, tokens, tier in parser.parse_gra(
+                "fixtures/compounds.xml"):
+            self.assertEqual(list(tier.heads), [NO_HEAD] * len(tokens))
+
+    def test_parse_unchanged(self):
+        parser = MorParser()
+        self.assertEqual(
+            [(u, s, repr(t)) for u, s, t in parser.parse("fixtures/commas.xml")],
+            [(u, s, repr(t)) for u, s, t, g
+             in parser.parse_gra("fixtures/commas.xml")])
+
+    def test_corpus_find(self):
+        corpus = DependencyCorpus.from_parser(
+            MorParser(), ["fixtures/clitics.xml", "fixtures/commas.xml",
+                          "fixtures/missing_pos.xml"])
+        pairs = [(dep.stem, head.stem)
+                 for dep, head in corpus.find_tokens('SUBJ', head_pos='v')]
+        self.assertEqual(pairs, [('genmod', 'be'), ('we', 'have'),
+                                 ('we', 'know'), ('cop', 'be')])
+        self.assertEqual(corpus.find('NOSUCHREL'), [])
+        subj = corpus.by_relation[corpus.relations.get('SUBJ')]
+        self.assertEqual(len(subj), 4)
+        self.assertTrue(all(corpus.relations.name(corpus.rels[i]) == 'SUBJ'
+                            for i in subj))
+        every_arc = corpus.find()
+        self.assertEqual(len(every_arc),
+                         sum(1 for head in corpus.heads if head >= 0))
+        self.assertEqual(every_arc, sorted(every_arc))
+        dets = corpus.find_tokens('DET', dependent_pos='det', head_pos='n')
+        self.assertEqual([(d.stem, h.stem) for d, h in dets],
+                         [('a', 'time'), ('the', 'pool')])
+
+if __name__ == "__main__":
+    unittest.main()
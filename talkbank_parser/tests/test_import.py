@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+class LazyImportTest(unittest.TestCase):
+    def loaded_modules(self, statement):
+        script = "import sys; {}; print(' '.join(sorted(sys.modules)))"
+        output = subprocess.check_output(
+            [sys.executable, '-c', script.format(statement)],
+            env=dict(os.environ, PYTHONPATH=ROOT))
+        return set(output.decode().split())
+
+    def test_import_is_light(self):
+        modules = self.loaded_modules("import talkbank_parser")
+        for heavy in ['pyparsing', 'talkbank_parser.pyparsing_mor_to_dict',
+                      'multiprocessing', 'xml.etree.ElementTree']:
+            self.assertNotIn(heavy, modules)
+
+    def test_grammar_loads_on_use(self):
+        modules = self.loaded_modules(
+            "import talkbank_parser; "
+            "talkbank_parser.MorToken.from_string('and/conj|and')")
+        self.assertIn('pyparsing', modules)
+
+    def test_tag_to_dict(self):
+        import talkbank_parser
+        self.assertEqual(talkbank_parser.tag_to_dict('a/det|a')['pos'], 'det')
+        self.assertIs(talkbank_parser.parse_tag, talkbank_parser.tag_to_dict)
+        self.assertEqual(talkbank_parser.Template('$a').substitute(a=1), '1')
+        self.assertTrue(callable(talkbank_parser.ElementTree))
+        from talkbank_parser.talkbank_parser import parse_tag
+        self.assertIs(parse_tag, talkbank_parser.tag_to_dict)
+        with self.assertRaises(AttributeError):
+            talkbank_parser.no_such_name
+
+if __name__ == "__main__":
+    unittest.main()
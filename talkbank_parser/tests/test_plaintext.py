@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+from talkbank_parser import (MorParser, MorToken, read_plaintext,
+                             xml_to_plaintext)
+from talkbank_parser.plaintext import (parse_plaintext_token,
+                                       plaintext_byte_ranges,
+                                       read_plaintext_range)
+
+
+class PlaintextReaderTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp(suffix=".txt")
+        os.close(handle)
+        xml_to_plaintext("fixtures/test_doc.xml", self.filename)
+        self.expected = list(MorParser().parse("fixtures/test_doc.xml"))
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def assertSameCorpus(self, expected, observed):
+        self.assertEqual(len(expected), len(observed))
+        for (uid, speaker, tokens), (o_uid, o_speaker, o_tokens) in zip(
+                expected, observed):
+            self.assertEqual(uid, o_uid)
+            self.assertEqual(speaker, o_speaker)
+            # MorToken.__eq__ ignores the wordform, so compare every field
+            self.assertEqual([t and vars(t) for t in tokens],
+                             [t and vars(t) for t in o_tokens])
+
+    def test_roundtrip(self):
+        self.assertSameCorpus(self.expected,
+                              list(read_plaintext(self.filename)))
+
+    def test_line_range(self):
+        self.assertSameCorpus(self.expected[5:10],
+                              list(read_plaintext(self.filename, 5, 10)))
+
+    def test_byte_ranges(self):
+        for chunk_size in [7, 64, 1000, 1 << 22]:
+            observed = []
+            for start, end in plaintext_byte_ranges(self.filename, chunk_size):
+                observed.extend(read_plaintext_range(self.filename, start, end))
+            self.assertSameCorpus(self.expected, observed)
+
+    def test_byte_ranges_split_on_newlines_only(self):
+        # str.splitlines() would also break on these
+        with open(self.filename, 'w') as outfile:
+            outfile.write("u1 CHI a/n|a\x0cb/n|b\x1cc/n|c\n"
+                          "u2 MOT d/n|d\x85e/n|e\u2028f/n|f\n")
+        expected = [(uid, speaker, [t.word for t in tokens])
+                    for uid, speaker, tokens in read_plaintext(self.filename)]
+        self.assertEqual([uid for uid, _, _ in expected], ['u1', 'u2'])
+        for chunk_size in [1, 5, 100]:
+            observed = []
+            for start, end in plaintext_byte_ranges(self.filename, chunk_size):
+                observed.extend(
+                    (uid, speaker, [t.word for t in tokens]) for
+                    uid, speaker, tokens in
+                    read_plaintext_range(self.filename, start, end))
+            self.assertEqual(expected, observed)
+
+    def test_missing_pos_and_stem(self):
+        with open(self.filename, 'w') as outfile:
+            outfile.write("u1 CHI " + repr(MorToken([], "xx", None, None,
+                                                    [], [], [])) + " None\n")
+        [(uid, speaker, tokens)] = list(read_plaintext(self.filename))
+        self.assertEqual(vars(tokens[0]), vars(MorToken([], "xx", None, None,
+                                                        [], [], [])))
+        self.assertIsNone(tokens[1])
+
+    def test_token_fields(self):
+        token = parse_plaintext_token("undid/un#v:aux:x|do&PAST&3S-PL-DIM")
+        self.assertEqual(token.word, "undid")
+        self.assertEqual(token.prefix, ["un"])
+        self.assertEqual(token.pos, "v")
+        self.assertEqual(token.subPos, ["aux", "x"])
+        self.assertEqual(token.stem, "do")
+        self.assertEqual(token.sxfx, ["PAST", "3S"])
+        self.assertEqual(token.sfx, ["PL", "DIM"])
+
+    def test_punctuation(self):
+        token = parse_plaintext_token("-/-|-")
+        self.assertEqual((token.word, token.pos, token.stem, token.sfx),
+                         ("-", "-", "-", []))
+
+if __name__ == "__main__":
+    unittest.main()
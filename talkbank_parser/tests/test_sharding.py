@@ -0,0 +1,188 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from talkbank_parser import MorParser
+from talkbank_parser import sharding
+
+FIXTURES = [os.path.join("fixtures", name) for name in
+            ["clitics.xml", "commas.xml", "missing_pos.xml", "test_doc.xml"]]
+
+
+class ShardingTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.expected = [(os.path.abspath(f), uid, speaker, tokens)
+                         for f in FIXTURES
+                         for uid, speaker, tokens in MorParser().parse(f)]
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_manifest(self):
+        manifest = sharding.write_manifest(self.work_dir, FIXTURES,
+                                           shard_size=3)
+        self.assertEqual([len(s['files']) for s in manifest['shards']], [3, 1])
+        self.assertEqual(sharding.read_manifest(self.work_dir), manifest)
+        self.assertEqual(set(sharding.status(self.work_dir).values()),
+                         {'pending'})
+
+    def test_multiple_workers(self):
+        sharding.write_manifest(self.work_dir, FIXTURES)
+        workers = [multiprocessing.Process(
+            target=sharding.run_worker, args=(self.work_dir, str(n)),
+            kwargs={'poll_interval': 0.1}) for n in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(set(sharding.status(self.work_dir).values()),
+                         {'done'})
+
+        merged = os.path.join(self.work_dir, 'merged.jsonl')
+        sharding.merge(self.work_dir, merged)
+        with open(merged) as infile:
+            observed = [json.loads(line) for line in infile]
+        self.assertEqual([(u['file'], u['uid'], u['speaker'])
+                          for u in observed],
+                         [e[:3] for e in self.expected])
+        self.assertEqual([t['word'] for t in observed[0]['tokens']],
+                         [t.word for t in self.expected[0][3]])
+
+    def test_binary_output(self):
+        sharding.write_manifest(self.work_dir, FIXTURES, shard_size=2,
+                                output_format='binary')
+        self.assertEqual(sharding.run_worker(self.work_dir), 2)
+        merged = os.path.join(self.work_dir, 'merged.pkl')
+        sharding.merge(self.work_dir, merged)
+        observed = list(sharding.read_merged(merged))
+        self.assertEqual([o[:3] for o in observed],
+                         [e[:3] for e in self.expected])
+        self.assertEqual([repr(t) for t in observed[-1][3]],
+                         [repr(t) for t in self.expected[-1][3]])
+        # shard pickles are concatenated as they are, keeping shared tokens
+        shards = [os.path.join(self.work_dir, 'shards', name) for name
+                  in os.listdir(os.path.join(self.work_dir, 'shards'))
+                  if name.endswith('.pkl')]
+        self.assertEqual(os.path.getsize(merged),
+                         sum(os.path.getsize(shard) for shard in shards))
+        last_shard = [u for u in observed if u[0] == observed[-1][0]]
+        articles = [t for utterance in last_shard for t in utterance[3]
+                    if repr(t) == 'the/det|the']
+        self.assertGreater(len(articles), 1)
+        self.assertTrue(all(t is articles[0] for t in articles))
+
+    def test_progress(self):
+        manifest = sharding.write_manifest(self.work_dir, FIXTURES,
+                                           shard_size=3)
+        first, second = [s['id'] for s in manifest['shards']]
+        self.assertEqual(sharding.progress(self.work_dir),
+                         {first: None, second: None})
+        sharding.run_worker(self.work_dir, 'w1')
+        reports = sharding.progress(self.work_dir)
+        self.assertEqual((reports[first]['files_done'],
+                          reports[first]['files_total'],
+                          reports[first]['worker']), (3, 3, 'w1'))
+        self.assertEqual(reports[first]['utterances'] +
+                         reports[second]['utterances'], len(self.expected))
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            sharding.main(['status', self.work_dir])
+        self.assertIn("{} done 3/3 files, {} utterances (w1)".format(
+            first, reports[first]['utterances']), output.getvalue())
+
+    def test_reclaim_stale_lock(self):
+        manifest = sharding.write_manifest(self.work_dir, FIXTURES[:2])
+        lock = os.path.join(self.work_dir, 'shards',
+                            manifest['shards'][0]['id'] + '.lock')
+        with open(lock, 'w') as crashed:
+            crashed.write('{}')
+        self.assertEqual(sharding.run_worker(self.work_dir, wait=False), 1)
+        self.assertEqual(sharding.status(self.work_dir)[
+            manifest['shards'][0]['id']], 'running')
+        with self.assertRaises(sharding.ShardError):
+            sharding.merge(self.work_dir, os.path.join(self.work_dir, 'out'))
+
+        stale = time.time() - 7200
+        os.utime(lock, (stale, stale))
+        self.assertEqual(sharding.run_worker(self.work_dir), 1)
+        self.assertEqual(set(sharding.status(self.work_dir).values()),
+                         {'done'})
+        self.assertFalse(os.path.exists(lock))
+
+    def test_concurrent_reclaim(self):
+        manifest = sharding.write_manifest(self.work_dir, FIXTURES[:3])
+        stale = time.time() - 7200
+        for shard in manifest['shards']:
+            lock = os.path.join(self.work_dir, 'shards', shard['id'] + '.lock')
+            with open(lock, 'w') as crashed:
+                crashed.write(json.dumps({'token': 'crashed'}))
+            os.utime(lock, (stale, stale))
+        pool = multiprocessing.Pool(4)
+        try:
+            counts = pool.starmap(sharding.run_worker,
+                                  [(self.work_dir, str(n), 3600, 0.05)
+                                   for n in range(4)])
+        finally:
+            pool.terminate()
+        # every shard is processed exactly once
+        self.assertEqual(sum(counts), 3)
+        self.assertEqual(set(sharding.status(self.work_dir).values()),
+                         {'done'})
+        # no locks, or locks set aside while breaking them, are left behind
+        leftovers = [f for f in os.listdir(os.path.join(self.work_dir,
+                                                        'shards'))
+                     if not f.endswith(('.jsonl', '.progress'))]
+        self.assertEqual(leftovers, [])
+
+    def test_stale_check_races_fresh_lock(self):
+        lock = os.path.join(self.work_dir, 'shard.lock')
+        with open(lock, 'w') as crashed:
+            crashed.write(json.dumps({'token': 'crashed'}))
+        stale = time.time() - 7200
+        os.utime(lock, (stale, stale))
+        # worker C saw the crashed lock, but worker B reclaims it first
+        token = sharding._claim(lock, 'B', 3600)
+        self.assertIsNotNone(token)
+        self.assertFalse(sharding._break_stale(lock, 'crashed', 3600))
+        self.assertEqual(sharding._lock_token(lock), token)
+        self.assertIsNone(sharding._claim(lock, 'C', 3600))
+
+    def test_expired_worker_keeps_off_new_lock(self):
+        lock = os.path.join(self.work_dir, 'shard.lock')
+        old_token = sharding._claim(lock, 'A', 3600)
+        stale = time.time() - 7200
+        os.utime(lock, (stale, stale))
+        new_token = sharding._claim(lock, 'B', 3600)
+        self.assertNotIn(new_token, (None, old_token))
+        with self.assertRaises(sharding.LeaseLost):
+            sharding._heartbeat(lock, old_token)
+        sharding._release(lock, old_token)
+        self.assertEqual(sharding._lock_token(lock), new_token)
+        sharding._release(lock, new_token)
+        self.assertFalse(os.path.exists(lock))
+        self.assertEqual(os.listdir(self.work_dir), [])
+
+    def test_failed_shard(self):
+        missing = os.path.join(self.work_dir, 'missing.xml')
+        manifest = sharding.write_manifest(self.work_dir, [missing])
+        shard_id = manifest['shards'][0]['id']
+        self.assertEqual(sharding.run_worker(self.work_dir), 0)
+        self.assertEqual(sharding.status(self.work_dir), {shard_id: 'failed'})
+        # failed shards are skipped until retried
+        shutil.copy(FIXTURES[0], missing)
+        self.assertEqual(sharding.run_worker(self.work_dir), 0)
+        self.assertEqual(sharding.run_worker(self.work_dir, retry_failed=True),
+                         1)
+        self.assertEqual(sharding.status(self.work_dir), {shard_id: 'done'})
+        self.assertEqual(sharding.clear_failed(self.work_dir), [])
+
+if __name__ == "__main__":
+    unittest.main()
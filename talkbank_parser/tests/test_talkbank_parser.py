@@ -7,7 +7,7 @@ import unittest
 from os import path
 from xml.etree.ElementTree import ElementTree
 
-from talkbank_parser import MorParser
+from talkbank_parser import FrozenMorToken, MorCache, MorParser
 
 
 class TalkbankParserTest(unittest.TestCase):
@@ -83,6 +83,57 @@ class TalkbankParserTest(unittest.TestCase):
                     'language': 'eng'
                 }]})
 
+    def test_cache(self):
+        uncached = list(MorParser().parse("fixtures/test_doc.xml"))
+        parser = MorParser(cache_size=32)
+        cached = list(parser.parse("fixtures/test_doc.xml"))
+        for (uid, speaker, tokens), (c_uid, c_speaker, c_tokens) in zip(
+                uncached, cached):
+            self.assertEqual((uid, speaker), (c_uid, c_speaker))
+            self.assertEqual([repr(t) for t in tokens],
+                             [repr(t) for t in c_tokens])
+            self.assertEqual(tokens, c_tokens)
+        info = parser.cache_info()
+        self.assertGreater(info.hits, 0)
+        self.assertEqual(info.maxsize, 32)
+        self.assertLessEqual(info.currsize, 32)
+        self.assertIsNone(MorParser().cache_info())
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = MorCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual((cache.get('b'), cache.get('c')), (2, 3))
+
+        # reading 'b' makes 'c' the least recently used entry
+        self.assertEqual(cache.get('b'), 2)
+        cache.put('d', 4)
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual((cache.get('b'), cache.get('d')), (2, 4))
+        self.assertEqual(cache.info(), (5, 2, 2, 2))
+
+    def test_cache_shares_frozen_tokens(self):
+        parser = MorParser(cache_size=8)
+        parser.namespace = ""
+        word = self.compounds.findall("w")[0]
+        first = parser.parse_mor_element(word, word.find('mor'))
+        second = parser.parse_mor_element(word, word.find('mor'))
+        self.assertIs(first[0], second[0])
+        with self.assertRaises(AttributeError):
+            first[0].stem = "other"
+        self.assertEqual(parser.cache_info().hits, 1)
+
+    def test_frozen_token_hash(self):
+        a = FrozenMorToken([], 'a', 'x', 'n', [], [], [])
+        b = FrozenMorToken([], 'b', 'x', 'n', [], [], [])
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(len({a, b}), 1)
+        self.assertNotEqual(hash(a),
+                            hash(FrozenMorToken([], 'a', 'y', 'n', [], [], [])))
+
     #written to test for abnormal tag reproduced in u7.xml
     def test_missing_pos(self):
         parser = MorParser()